@@ -0,0 +1,123 @@
+import zlib
+import string
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import deflate  # libdeflate bindings, optional
+except ImportError:
+    deflate = None
+
+try:
+    import zstandard  # optional
+except ImportError:
+    zstandard = None
+
+try:
+    from numba import njit  # optional
+except ImportError:
+    njit = None
+
+# === Compression & Corruption Functions ===
+_local = threading.local()
+_PRINTABLE = np.frombuffer(string.printable.encode('ascii'), dtype=np.uint8)
+
+# Level 1 is several times faster than zlib's default of 6; results are only
+# comparable between runs at the same backend and level
+DEFAULT_LEVEL = 1
+
+def _thread_compressor(backend: str, level: int, factory):
+    # Compressor objects are reused but not shared between threads
+    compressors = getattr(_local, 'compressors', None)
+    if compressors is None:
+        compressors = _local.compressors = {}
+    c = compressors.get((backend, level))
+    if c is None:
+        c = compressors[(backend, level)] = factory(level)
+    return c
+
+def _zlib_size(buf: bytes, level: int) -> int:
+    # One long-lived raw stream; Z_FULL_FLUSH resets the dictionary so
+    # each measurement matches a fresh compression
+    c = _thread_compressor('zlib', level, lambda lvl: zlib.compressobj(lvl, zlib.DEFLATED, -15))
+    return len(c.compress(buf)) + len(c.flush(zlib.Z_FULL_FLUSH))
+
+def _libdeflate_size(buf: bytes, level: int) -> int:
+    return len(deflate.zlib_compress(buf, level))
+
+def _zstd_size(buf: bytes, level: int) -> int:
+    c = _thread_compressor('zstd', level, lambda lvl: zstandard.ZstdCompressor(level=lvl))
+    return len(c.compress(buf))
+
+BACKENDS = {'zlib': _zlib_size}
+if zstandard is not None:
+    BACKENDS['zstd'] = _zstd_size
+if deflate is not None:
+    BACKENDS['libdeflate'] = _libdeflate_size
+DEFAULT_BACKEND = 'libdeflate' if deflate is not None else 'zlib'
+
+def compress_size_bytes(buf: bytes, level: int = DEFAULT_LEVEL, backend: str = DEFAULT_BACKEND) -> int:
+    return BACKENDS[backend](buf, level)
+
+def corrupt_text(text_bytes: bytes, num_corrupt: int, rng: np.random.Generator) -> bytes:
+    buf = bytearray(text_bytes)
+    # Writable view straight onto the bytearray, no intermediate copy
+    view = np.frombuffer(buf, dtype=np.uint8)
+    idx = rng.choice(len(buf), num_corrupt, replace=False, shuffle=False)
+    view[idx] = _PRINTABLE[rng.integers(0, len(_PRINTABLE), num_corrupt)]
+    return bytes(buf)
+
+@lru_cache(maxsize=32)
+def noise_size(n: int, level: int = DEFAULT_LEVEL, backend: str = DEFAULT_BACKEND) -> int:
+    # Fully corrupted text is pure noise: its size depends only on the length,
+    # and for uniform noise it barely varies between draws, so one sample does
+    noise = _PRINTABLE[np.random.default_rng(n).integers(0, len(_PRINTABLE), n)]
+    return compress_size_bytes(noise.tobytes(), level, backend)
+
+if njit is not None:
+    # The explicit signature compiles (or loads from the on-disk cache) at
+    # import and is the only one allowed, so workers never compile mid-analysis
+    @njit('void(uint8[:, ::1], intp[:, ::1], uint8[:, ::1])', cache=True)
+    def _scatter_rows(out, idx, vals):
+        for t in range(out.shape[0]):
+            for j in range(idx.shape[1]):
+                out[t, idx[t, j]] = vals[t, j]
+else:
+    def _scatter_rows(out, idx, vals):
+        for row, i, v in zip(out, idx, vals):
+            row[i] = v
+
+def step_worker(task):
+    step_idx, start, text_bytes, corrupt, count, seed, level, backend = task
+    rng = np.random.default_rng(seed)
+    base = np.frombuffer(text_bytes, dtype=np.uint8)
+    n = len(base)
+    # Draw whichever of the corrupted or kept positions is the smaller set;
+    # the complement of a uniform random subset is uniform too
+    flip = corrupt > n // 2
+    idx = np.empty((count, n - corrupt if flip else corrupt), dtype=np.intp)
+    for row in idx:
+        row[:] = rng.choice(n, idx.shape[1], replace=False, shuffle=False)
+    if flip:
+        bufs = _PRINTABLE[rng.integers(0, len(_PRINTABLE), (count, n))]
+        vals = base[idx]
+    else:
+        bufs = np.broadcast_to(base, (count, n)).copy()
+        vals = _PRINTABLE[rng.integers(0, len(_PRINTABLE), idx.shape)]
+    _scatter_rows(bufs, idx, vals)
+    del idx, vals  # not needed while compressing
+    sizes = np.fromiter((compress_size_bytes(row.tobytes(), level, backend) for row in bufs),
+                        dtype=np.int32, count=count)
+    return step_idx, start, sizes
+
+@lru_cache(maxsize=None)
+def area_weights(steps: int) -> np.ndarray:
+    # Rows give A = sum(V) - (N+1)·V(N) and B = (N+1)·V(0) - sum(V) as W @ V
+    W = np.ones((2, steps))
+    W[0, -1] -= steps
+    W[1] = -1
+    W[1, 0] += steps
+    W.flags.writeable = False
+    return W
@@ -1,40 +1,86 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-import zlib
-import random
-import string
-
-# === Compression & Corruption Functions ===
-def compress_size(text: str) -> int:
-    return len(zlib.compress(text.encode('utf-8')))
-
-def corrupt_text(text: str, num_corrupt: int) -> str:
-    chars = list(text)
-    indices = random.sample(range(len(text)), num_corrupt)
-    for idx in indices:
-        chars[idx] = random.choice(string.printable)
-    return ''.join(chars)
-
-def estimate_text_complexity(text: str, steps=21, trials=30):
-    n = len(text)
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import hashlib
+import sys
+import types
+from contextlib import contextmanager
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_all_start_methods, get_context
+
+from complexity import (
+    BACKENDS, DEFAULT_BACKEND, DEFAULT_LEVEL, area_weights, compress_size_bytes, corrupt_text, noise_size,
+    step_worker,
+)
+
+# === Complexity Estimation & Plotting ===
+# Small enough to keep every core busy even at the minimum step count
+TRIALS_PER_TASK = 4
+
+@st.cache_resource
+def get_pool():
+    # Workers must not be forked from Streamlit's multithreaded server
+    if 'forkserver' in get_all_start_methods():
+        ctx = get_context('forkserver')
+        ctx.set_forkserver_preload(['complexity'])
+    else:
+        ctx = get_context('spawn')
+    return ProcessPoolExecutor(mp_context=ctx)
+
+@contextmanager
+def _plain_main():
+    # New workers re-run the __main__ module's file on startup, and under
+    # Streamlit that is this script; hide it while submit() may start them
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def estimate_text_complexity(text_bytes: bytes, steps=21, trials=30, level=DEFAULT_LEVEL,
+                             backend=DEFAULT_BACKEND):
+    n = len(text_bytes)
     step_fracs = np.linspace(0.0, 1.0, steps)
-    compressed_sizes = []
+    sizes = np.empty((steps, trials), dtype=np.int32)
+    # Seeded from the text so the same input always gives the same curve
+    digest = hashlib.blake2b(text_bytes, digest_size=16).digest()
+    seeds = np.random.SeedSequence(int.from_bytes(digest, 'little'))
+    tasks = []
 
-    for frac in step_fracs:
+    for i, frac in enumerate(step_fracs):
         keep = int(frac * n)
         corrupt = n - keep
-        sizes = []
-        for _ in range(trials):
-            corrupted = corrupt_text(text, corrupt)
-            sizes.append(compress_size(corrupted))
-        compressed_sizes.append(np.mean(sizes))
-
-    V = np.array(compressed_sizes)
+        # The endpoints are measured once; every trial column shares it
+        if corrupt == 0:
+            sizes[i] = compress_size_bytes(text_bytes, level, backend)
+        elif corrupt == n:
+            sizes[i] = noise_size(n, level, backend)
+        else:
+            for start in range(0, trials, TRIALS_PER_TASK):
+                count = min(TRIALS_PER_TASK, trials - start)
+                tasks.append((i, start, text_bytes, corrupt, count, seeds.spawn(1)[0], level, backend))
+
+    pool = get_pool()
+    try:
+        with _plain_main():
+            futures = [pool.submit(step_worker, task) for task in tasks]
+        for future in as_completed(futures):
+            i, start, chunk_sizes = future.result()
+            sizes[i, start:start + len(chunk_sizes)] = chunk_sizes
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); the next run starts a fresh pool
+        pool.shutdown(wait=False, cancel_futures=True)
+        get_pool.clear()
+        raise
+
+    V = sizes.mean(axis=1, dtype=np.float64)
     V0, VN = V[0], V[-1]
-    N = steps - 1
-    A = -(N+1) * VN + V.sum()
-    B = -V.sum() + (N+1) * V0
+    A, B = area_weights(steps) @ V
     EF = A / B if B != 0 else 0
     AC = VN
     SS = (V0 - VN) / V0 if V0 != 0 else 0
@@ -42,11 +88,15 @@ def estimate_text_complexity(text: str, steps=21, trials=30):
     C_norm = C / (V0) if V0 != 0 else 0
     return V, V0, VN, A, B, EF, AC, SS, C, C_norm
 
-def plot_text_complexity(V, V0, VN, A, B):
+@st.cache_data(max_entries=32, show_spinner=False, hash_funcs={np.ndarray: lambda a: a.tobytes()})
+def plot_text_complexity(V, V0, VN, A, B) -> bytes:
     N = len(V) - 1
     x = np.arange(N + 1)
 
-    fig, ax = plt.subplots(figsize=(8, 5))
+    # Built without pyplot so no figure lingers in its global registry
+    fig = Figure(figsize=(8, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     ax.plot(x, V, 'o-', label='V(i)', lw=2)
     ax.hlines(V0, 0, N, colors='gray', linestyles='--', label='V(0)')
     ax.hlines(VN, 0, N, colors='black', linestyles='--', label='V(N)')
@@ -60,7 +110,28 @@ def plot_text_complexity(V, V0, VN, A, B):
     ax.legend(loc='lower left')
     ax.grid(True)
     fig.tight_layout()
-    return fig
+    png = BytesIO()
+    fig.savefig(png, format='png', dpi=200, bbox_inches='tight')
+    return png.getvalue()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _make_preview(text_bytes: bytes, num_corrupt: int, seed: int) -> str:
+    # Corrupted bytes may split a multi-byte character, as in the analysis
+    corrupted = corrupt_text(text_bytes, num_corrupt, np.random.default_rng(seed))
+    return corrupted.decode('utf-8', errors='replace')
+
+@st.fragment
+def _preview_fragment(text: str, text_bytes: bytes):
+    # Runs as a fragment so its widgets rerun only this block, not the analysis
+    noise_pct = st.slider("Select noise level (%)", 100, 0, 100, step=5)
+    seed = st.number_input("Preview seed", min_value=0, value=0, step=1)
+    num_corrupt = int((noise_pct / 100) * len(text_bytes))
+
+    if noise_pct > 0:
+        preview = _make_preview(text_bytes, num_corrupt, seed=int(seed))
+        st.text_area(f"Corrupted Text ({noise_pct}% noise)", preview, height=300)
+    else:
+        st.text_area("Original Text (0% noise)", text, height=300)
 
 # === Streamlit App ===
 st.title("Text Complexity Analyzer")
@@ -81,6 +152,11 @@ Measured in **bytes**, it combines:
 - Compression gain (V(0) − V(N))/V(0)
 
 We also provide a **normalized version** (`Cₙₒᵣₘ`) to compare across texts of different lengths.
+
+Compression runs at level 1 by default for speed, and the compressor can be switched
+(zstd and libdeflate are offered when installed). Both choices change every V(i), and with them
+all of the figures above, so results are only comparable between runs that use the same
+compressor and level.
 """)
 
 # --- Input section ---
@@ -105,13 +181,23 @@ text_input = st.text_area(
 
 # Prefer whatever is in the box; fall back to the uploaded file’s text
 text_to_analyze = text_input.strip() or file_text
+# Encoded once here; everything downstream works on these bytes
+text_bytes = text_to_analyze.encode('utf-8')
 
 steps = st.slider("Number of corruption levels", 5, 41, 21, step=2)
 trials = st.slider("Trials per corruption level", 1, 50, 30)
+backend = st.selectbox("Compressor", list(BACKENDS), index=list(BACKENDS).index(DEFAULT_BACKEND))
+level = st.slider("Compression level", 1, 9, DEFAULT_LEVEL)
 
 if len(text_to_analyze) >= 20:
-    with st.spinner("Analyzing complexity..."):
-        V, V0, VN, A, B, EF, AC, SS, C, C_norm = estimate_text_complexity(text_to_analyze, steps=steps, trials=trials)
+    try:
+        with st.spinner("Analyzing complexity..."):
+            V, V0, VN, A, B, EF, AC, SS, C, C_norm = estimate_text_complexity(
+                text_bytes, steps=steps, trials=trials, level=level, backend=backend)
+    except BrokenProcessPool:
+        st.error("A worker process died during the analysis, possibly from running out of memory. "
+                 "Try again, or use a shorter text or fewer trials.")
+        st.stop()
 
     st.markdown(f"""
 **Baseline size (V₀)**: `{V0:.1f}` bytes  
@@ -126,16 +212,9 @@ if len(text_to_analyze) >= 20:
 **Emergent Structural Complexity (C):** `{C:.2f}` bytes,  
 **Normalized Complexity (Cₙₒᵣₘ)**: `{C_norm:.6f}` (unitless, relative)
 """)
-    st.pyplot(plot_text_complexity(V, V0, VN, A, B))
+    st.image(plot_text_complexity(V, V0, VN, A, B))
 
     st.header("Preview Text at Selected Noise Level")
-    noise_pct = st.slider("Select noise level (%)", 100, 0, 100, step=5)
-    num_corrupt = int((noise_pct / 100) * len(text_to_analyze))
-
-    if noise_pct > 0:
-        preview = corrupt_text(text_to_analyze, num_corrupt)
-        st.text_area(f"Corrupted Text ({noise_pct}% noise)", preview, height=300)
-    else:
-        st.text_area("Original Text (0% noise)", text_to_analyze, height=300)
+    _preview_fragment(text_to_analyze, text_bytes)
 else:
     st.info("Enter at least 20 characters of text to begin analysis.")